@@ -1,10 +1,16 @@
 # Copyright 2020, Alex Badics, All Rights Reserved
-from typing import Tuple, Dict, List, Type, ClassVar, Union
+from typing import Tuple, Dict, List, Set, Type, ClassVar, Union, Any, Sequence, Optional, Iterator
 from pathlib import Path
 from abc import ABC, abstractmethod
+from hashlib import md5
 import gzip
-import json
+import inspect
+import os
+import pickle
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 
 import yaml
 import attr
@@ -19,61 +25,109 @@ from hun_law.structure import \
 
 from hun_law.utils import Date, identifier_less
 from hun_law.parsers.semantic_parser import ActSemanticsParser, SemanticParseState
+import hun_law
 from hun_law import dict2object
 
+from ajdb.config import AJDBConfig
 from ajdb.structure import ConcreteEnforcementDate, \
     ArticleWM, ArticleWMProxy, ActWM, ParagraphWM,\
-    SaeWMType, SaeMetadata, add_metadata, WM_ABLE_SAE_CLASSES, SAE_WM_CLASSES, \
+    SaeWMType, SaeMetadata, add_metadata, WM_ABLE_SAE_CLASSES, SAE_WM_CLASSES, SAE_SIMPLE_TO_WM_MAP, \
     ActSet
 
-from ajdb.utils import iterate_all_saes_of_act, first_matching_index, evolve_into
+from ajdb.utils import iterate_all_saes_of_act, evolve_into, json_loads, json_dumps_indented, interned_reference, read_gzip_file, GZIP_COMPRESSLEVEL
 from ajdb.fixups import apply_fixups
 
 NOT_ENFORCED_TEXT = ' '
 
 act_converter = dict2object.get_converter(Act)
 
+# The C implementation is a lot faster, but it is not available everywhere
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
 
 @attr.s(slots=True, frozen=True, auto_attribs=True)
 class EnforcementDateSet:
     default: ConcreteEnforcementDate
     specials: Tuple[Tuple[Reference, ConcreteEnforcementDate], ...]
+    # The specials that could apply to a specific article, in the original order.
+    # Key None contains the ones that could apply to any article (e.g. ranges).
+    specials_by_article: Dict[Optional[str], Tuple[Tuple[Reference, ConcreteEnforcementDate], ...]] = \
+        attr.ib(init=False, eq=False, repr=False)
+    # id(ConcreteEnforcementDate) -> SaeMetadata with only that enforcement date.
+    # Only a handful of different ones exist per act, so all SAEs can share them.
+    # All dates are referenced by the set itself, so their ids stay valid.
+    metadata_cache: Dict[int, SaeMetadata] = attr.ib(init=False, eq=False, repr=False, factory=dict)
+    # Same as specials_by_article, but further narrowed down by paragraph. Filled lazily.
+    specials_by_paragraph: Dict[Tuple[Any, Any], Tuple[Tuple[Reference, ConcreteEnforcementDate], ...]] = \
+        attr.ib(init=False, eq=False, repr=False, factory=dict)
+
+    @specials_by_article.default
+    def _specials_by_article_default(self) -> Dict[Optional[str], Tuple[Tuple[Reference, ConcreteEnforcementDate], ...]]:
+        article_ids = set(ref.article for ref, _ in self.specials if isinstance(ref.article, str))
+        result: Dict[Optional[str], Tuple[Tuple[Reference, ConcreteEnforcementDate], ...]] = {
+            article_id: tuple(s for s in self.specials if not isinstance(s[0].article, str) or s[0].article == article_id)
+            for article_id in article_ids
+        }
+        result[None] = tuple(s for s in self.specials if not isinstance(s[0].article, str))
+        return result
 
     @classmethod
     def from_act(cls, act: Act) -> 'EnforcementDateSet':
         default = None
         specials = []
+        earliest_special_date: Optional[Date] = None
+        # So that equal dates are the very same instance
+        concrete_eds: Dict[ConcreteEnforcementDate, ConcreteEnforcementDate] = {}
         for sae in iterate_all_saes_of_act(act):
             assert sae.semantic_data is not None
+            if not sae.semantic_data:
+                continue
             for semantic_data_element in sae.semantic_data:
                 if isinstance(semantic_data_element, EnforcementDate):
                     concrete_ed = ConcreteEnforcementDate.from_enforcement_date(semantic_data_element, act.publication_date)
+                    concrete_ed = concrete_eds.setdefault(concrete_ed, concrete_ed)
                     if semantic_data_element.position is None:
                         assert default is None
                         default = concrete_ed
                     else:
+                        # The invariants of the specials are checked here, instead of in separate passes
+                        assert concrete_ed.to_date is None
+                        if earliest_special_date is None or concrete_ed.from_date < earliest_special_date:
+                            earliest_special_date = concrete_ed.from_date
                         ref = attr.evolve(semantic_data_element.position, act=act.identifier)
                         specials.append((ref, concrete_ed))
         assert default is not None, act.identifier
-        assert all(default.from_date <= special.from_date for _, special in specials)
-        assert all(special.to_date is None for _, special in specials)
+        assert earliest_special_date is None or default.from_date <= earliest_special_date
         return EnforcementDateSet(default, tuple(specials))
 
-    def sae_modifier(self, reference: Reference, sae: SaeWMType) -> SaeWMType:
+    def enforcement_date_for_reference(self, reference: Reference) -> ConcreteEnforcementDate:
         applicable_ced = self.default
-        for ced_reference, ced in self.specials:
-            if ced_reference.contains(reference):
-                applicable_ced = ced
-        return attr.evolve(
-            sae,
-            metadata=attr.evolve(
-                sae.metadata,
-                enforcement_date=applicable_ced
-            )
-        )
-
-    def article_modifier(self, reference: Reference, article: ArticleWM) -> ArticleWM:
-        return article.map_recursive_wm(reference, self.sae_modifier, children_first=True)
+        # Most acts don't have any special enforcement dates at all
+        if self.specials:
+            paragraph_key = (reference.article, reference.paragraph)
+            candidates = self.specials_by_paragraph.get(paragraph_key)
+            if candidates is None:
+                article_candidates = self.specials_by_article.get(reference.article)
+                if article_candidates is None:
+                    article_candidates = self.specials_by_article[None]
+                candidates = tuple(
+                    s for s in article_candidates
+                    if not isinstance(s[0].paragraph, str) or s[0].paragraph == reference.paragraph
+                )
+                self.specials_by_paragraph[paragraph_key] = candidates
+            for ced_reference, ced in candidates:
+                if ced_reference.contains(reference):
+                    applicable_ced = ced
+        return applicable_ced
+
+    def metadata_for_reference(self, reference: Reference) -> SaeMetadata:
+        # Metadata for an SAE that had no metadata before
+        applicable_ced = self.enforcement_date_for_reference(reference)
+        metadata = self.metadata_cache.get(id(applicable_ced))
+        if metadata is None:
+            metadata = SaeMetadata(enforcement_date=applicable_ced)
+            self.metadata_cache[id(applicable_ced)] = metadata
+        return metadata
 
     def interesting_dates(self) -> Tuple[Date, ...]:
         result = set()
@@ -82,7 +136,8 @@ class EnforcementDateSet:
             result.add(self.default.to_date)
 
         result.update(special.from_date for _, special in self.specials)
-        return tuple(result)
+        # Sorted, so that the stored order doesn't depend on set iteration order
+        return tuple(sorted(result))
 
 
 @attr.s(slots=True, auto_attribs=True)
@@ -91,6 +146,11 @@ class ModificationApplier(ABC):
     source_sae: SaeWMType = attr.ib()
     current_date: Date = attr.ib()
     applied: bool = attr.ib(init=False, default=False)
+    # Whether the applier can leave SAEs without semantic data in the act,
+    # i.e. whether the act has to go through the semantic parser afterwards.
+    CREATES_UNPARSED_SAES: ClassVar[bool] = True
+    # The modification types that can_apply may accept
+    MODIFICATION_TYPES: ClassVar[Tuple[Type[SemanticData], ...]] = ()
 
     @classmethod
     @abstractmethod
@@ -110,6 +170,7 @@ class ModificationApplier(ABC):
 
 @attr.s(slots=True, auto_attribs=True)
 class TextReplacementApplier(ModificationApplier):
+    MODIFICATION_TYPES: ClassVar[Tuple[Type[SemanticData], ...]] = (TextAmendment, Repeal)
     position: Reference = attr.ib(init=False)
     original_text: str = attr.ib(init=False)
     replacement_text: str = attr.ib(init=False)
@@ -142,13 +203,24 @@ class TextReplacementApplier(ModificationApplier):
     def can_apply(cls, modification: SemanticData) -> bool:
         return isinstance(modification, TextAmendment) or (isinstance(modification, Repeal) and modification.text is not None)
 
+    def replace_in(self, text: Optional[str]) -> Tuple[Optional[str], bool]:
+        # Also returns whether there was anything to replace, so that callers
+        # don't have to search for the original text (or compare the results) again.
+        if text is None or self.original_text not in text:
+            return text, False
+        return text.replace(self.original_text, self.replacement_text), True
+
     def text_replacer(self, _reference: Reference, sae: SaeWMType) -> SaeWMType:
-        new_text = sae.text.replace(self.original_text, self.replacement_text) if sae.text is not None else None
-        new_intro = sae.intro.replace(self.original_text, self.replacement_text) if sae.intro is not None else None
-        new_wrap_up = sae.wrap_up.replace(self.original_text, self.replacement_text) if sae.wrap_up is not None else None
-        if sae.text == new_text and sae.intro == new_intro and sae.wrap_up == new_wrap_up:
+        new_text, text_replaced = self.replace_in(sae.text)
+        new_intro, intro_replaced = self.replace_in(sae.intro)
+        new_wrap_up, wrap_up_replaced = self.replace_in(sae.wrap_up)
+        # Most SAEs do not contain the text at all
+        if not (text_replaced or intro_replaced or wrap_up_replaced):
             return sae
         self.applied = True
+        # The text stays the same, so there is no reason to throw away the semantic data
+        if self.original_text == self.replacement_text:
+            return sae
         return attr.evolve(
             sae,
             text=new_text,
@@ -162,6 +234,52 @@ class TextReplacementApplier(ModificationApplier):
     def apply(self, act: ActWM) -> ActWM:
         return act.map_saes(self.text_replacer, self.position)
 
+    @classmethod
+    def apply_multiple(cls, appliers: Sequence['TextReplacementApplier'], act: ActWM) -> ActWM:
+        # Same as calling apply() on all appliers in order, but the act is only walked once.
+        # The replacements are still done one by one, in order, on every SAE: doing them in
+        # a single regex pass would behave differently for overlapping texts, or when a
+        # replacement creates text that a later amendment is supposed to replace.
+        if not appliers:
+            return act
+
+        # Amendments usually target a single article, so only check the ones that can apply
+        # to the current article (still in the original order).
+        general_appliers = [a for a in appliers if not isinstance(a.position.article, str)]
+        appliers_by_article = {
+            article_id: [a for a in appliers if not isinstance(a.position.article, str) or a.position.article == article_id]
+            for article_id in set(a.position.article for a in appliers if isinstance(a.position.article, str))
+        }
+
+        def multi_text_replacer(reference: Reference, sae: SaeWMType) -> SaeWMType:
+            # Works on the strings themselves, so that the SAE is only rebuilt once,
+            # no matter how many replacements apply to it.
+            text, intro, wrap_up = sae.text, sae.intro, sae.wrap_up
+            changed = False
+            for applier in appliers_by_article.get(reference.article, general_appliers):
+                if not applier.position.contains(reference):
+                    continue
+                text, text_replaced = applier.replace_in(text)
+                intro, intro_replaced = applier.replace_in(intro)
+                wrap_up, wrap_up_replaced = applier.replace_in(wrap_up)
+                if not (text_replaced or intro_replaced or wrap_up_replaced):
+                    continue
+                applier.applied = True
+                if applier.original_text != applier.replacement_text:
+                    changed = True
+            if not changed:
+                return sae
+            return attr.evolve(
+                sae,
+                text=text,
+                intro=intro,
+                wrap_up=wrap_up,
+                semantic_data=None,
+                outgoing_references=None,
+                act_id_abbreviations=None,
+            )
+        return act.map_saes_multi(multi_text_replacer, [applier.position for applier in appliers])
+
     @property
     def priority(self) -> int:
         # Sorting these modifications is needed because of cases like:
@@ -176,6 +294,9 @@ class TextReplacementApplier(ModificationApplier):
 
 @attr.s(slots=True, auto_attribs=True)
 class ArticleTitleAmendmentApplier(ModificationApplier):
+    CREATES_UNPARSED_SAES: ClassVar[bool] = False
+    MODIFICATION_TYPES: ClassVar[Tuple[Type[SemanticData], ...]] = (ArticleTitleAmendment, )
+
     @classmethod
     def can_apply(cls, modification: SemanticData) -> bool:
         return isinstance(modification, ArticleTitleAmendment)
@@ -196,10 +317,39 @@ class ArticleTitleAmendmentApplier(ModificationApplier):
         assert reference_type is Article
         return act.map_articles(self.modifier, self.modification.position)
 
+    @classmethod
+    def apply_multiple(cls, appliers: Sequence['ArticleTitleAmendmentApplier'], act: ActWM) -> ActWM:
+        # Same as calling apply() on all appliers in order, but only the affected articles are visited, and only once.
+        if len(appliers) < 2:
+            for applier in appliers:
+                act = applier.apply(act)
+            return act
+
+        positions = []
+        for applier in appliers:
+            assert isinstance(applier.modification, ArticleTitleAmendment)
+            # Same check as in apply(): the positions are used as article filters
+            _, reference_type = applier.modification.position.last_component_with_type()
+            assert reference_type is Article
+            positions.append(applier.modification.position)
+
+        def multi_modifier(reference: Reference, article: ArticleWM) -> ArticleWM:
+            for applier, position in zip(appliers, positions):
+                if position.contains(reference):
+                    article = applier.modifier(reference, article)
+            return article
+        return act.map_articles_multi(multi_modifier, positions)
+
 
 CuttableChildrenType = Tuple[Union[SubArticleChildType, ArticleWMProxy], ...]
 
 
+@lru_cache(maxsize=None)
+def structural_end_types(structural_type: Type[StructuralElement]) -> Tuple[Type[Any], ...]:
+    # A structural element ends at the next element of the same type, or of any of its parent types
+    return (structural_type, *structural_type.PARENT_TYPES)
+
+
 def get_cut_points_for_structural_reference(position: StructuralReference, children: CuttableChildrenType) -> Tuple[int, int]:
     structural_id, structural_type_nc = position.last_component_with_type()
     assert structural_id is not None
@@ -208,43 +358,55 @@ def get_cut_points_for_structural_reference(position: StructuralReference, child
     # Pypy does not properly infer the type of structural_type without this explicit assignment
     structural_type: Type[StructuralElement] = structural_type_nc
 
+    # Plain scans that stop at the first match: the children change with almost every
+    # structural amendment, so building any kind of index would cost more than this.
     start_cut = 0
     if position.book is not None:
         book_id = position.book
-        start_cut = first_matching_index(children, lambda c: bool(isinstance(c, Book) and book_id == c.identifier))
+        start_cut = next((i for i, c in enumerate(children) if isinstance(c, Book) and c.identifier == book_id), len(children))
         assert start_cut < len(children)
 
-    start_cut = first_matching_index(
-        children,
-        lambda c: isinstance(c, structural_type) and structural_id in (c.identifier, c.title),
-        start=start_cut
+    # Indexing instead of slicing, so that the children tuple is not copied.
+    start_cut = next(
+        (
+            i for i in range(start_cut, len(children))
+            if isinstance(children[i], structural_type) and structural_id in (children[i].identifier, children[i].title)
+        ),
+        len(children)
     )
     # TODO: Insertions are should be legal though, but this is most likely a mistake, so
     # keep an error until I find an actual insertion. It will need to be handled separately.
     assert start_cut < len(children), ("Only replacements are supported for structural amendments or repeals", position)
 
-    end_cut = first_matching_index(
-        children,
-        lambda c: isinstance(c, (structural_type, * structural_type.PARENT_TYPES)),
-        start=start_cut + 1
-    )
+    end_types = structural_end_types(structural_type)
+    end_cut = next((i for i in range(start_cut + 1, len(children)) if isinstance(children[i], end_types)), len(children))
     return start_cut, end_cut
 
 
 @attr.s(slots=True, auto_attribs=True)
 class RepealApplier(ModificationApplier):
+    CREATES_UNPARSED_SAES: ClassVar[bool] = False
+    MODIFICATION_TYPES: ClassVar[Tuple[Type[SemanticData], ...]] = (Repeal, )
+    # from_date -> metadata. Repealed SAEs of the same repeal usually share it.
+    metadata_cache: Dict[Date, SaeMetadata] = attr.ib(init=False, factory=dict)
+
     @classmethod
     def can_apply(cls, modification: SemanticData) -> bool:
         return isinstance(modification, Repeal) and modification.text is None
 
     def create_new_metadata(self, sae: SaeWMType) -> SaeMetadata:
         assert sae.metadata.enforcement_date is not None
-        return SaeMetadata(
-            enforcement_date=ConcreteEnforcementDate(
-                from_date=sae.metadata.enforcement_date.from_date,
-                to_date=self.current_date,
+        from_date = sae.metadata.enforcement_date.from_date
+        result = self.metadata_cache.get(from_date)
+        if result is None:
+            result = SaeMetadata(
+                enforcement_date=ConcreteEnforcementDate(
+                    from_date=from_date,
+                    to_date=self.current_date,
+                )
             )
-        )
+            self.metadata_cache[from_date] = result
+        return result
 
     def sae_repealer(self, _reference: Reference, sae: SaeWMType) -> SaeWMType:
         self.applied = True
@@ -285,7 +447,10 @@ class RepealApplier(ModificationApplier):
             assert position.special.position == SubtitleArticleComboType.BEFORE_WITHOUT_ARTICLE, \
                 "Only BEFORE_WITHOUT_ARTICLE is supported for special subtitle repeals for now"
             article_id = position.special.article_id
-            end_cut = first_matching_index(act.children, lambda c: isinstance(c, (Article, ArticleWMProxy)) and c.identifier == article_id)
+            end_cut = next(
+                (i for i, c in enumerate(act.children) if isinstance(c, (Article, ArticleWMProxy)) and c.identifier == article_id),
+                len(act.children)
+            )
             if end_cut >= len(act.children):
                 # Not found: probably an error. Calling code will Warn probably.
                 return act
@@ -304,21 +469,76 @@ class RepealApplier(ModificationApplier):
             return act.map_saes(self.sae_repealer, self.modification.position)
         return self.apply_to_act(act)
 
+    def is_sae_repeal(self) -> bool:
+        assert isinstance(self.modification, Repeal)
+        position = self.modification.position
+        return isinstance(position, Reference) and position.last_component_with_type()[1] is not Article
+
+    @classmethod
+    def apply_multiple_sae_repeals(cls, appliers: Sequence['RepealApplier'], act: ActWM) -> ActWM:
+        # Same as calling apply() on all the (SAE repealing) appliers in order, but the act is only walked once.
+        # The walk is children first, so repealing both an SAE and its parent gives the same result.
+        # If the parent was repealed first though, the child repeal shouldn't count as applied, so
+        # the applied SAE references are tracked, and the ones that got repealed by an earlier parent
+        # repeal are thrown away.
+        if len(appliers) < 2:
+            for applier in appliers:
+                act = applier.apply(act)
+            return act
+
+        applied_to: List[List[Reference]] = [[] for _ in appliers]
+
+        def multi_sae_repealer(reference: Reference, sae: SaeWMType) -> SaeWMType:
+            repealed = False
+            for index, applier in enumerate(appliers):
+                assert isinstance(applier.modification, Repeal)
+                if not applier.modification.position.contains(reference):
+                    continue
+                # Repealing an already repealed SAE would create an equal SAE, so it is only done once.
+                if not repealed:
+                    sae = applier.sae_repealer(reference, sae)
+                    repealed = True
+                for later_applied_to in applied_to[index + 1:]:
+                    later_applied_to[:] = [r for r in later_applied_to if not reference.contains(r)]
+                applied_to[index].append(reference)
+            return sae
+
+        positions = []
+        for applier in appliers:
+            assert isinstance(applier.modification, Repeal)
+            assert isinstance(applier.modification.position, Reference)
+            positions.append(applier.modification.position)
+        act = act.map_saes_multi(multi_sae_repealer, positions, children_first=True)
+        for applier, applier_applied_to in zip(appliers, applied_to):
+            applier.applied = bool(applier_applied_to)
+        return act
+
 
 @attr.s(slots=True, auto_attribs=True)
 class BlockAmendmentApplier(ModificationApplier):
+    MODIFICATION_TYPES: ClassVar[Tuple[Type[SemanticData], ...]] = (BlockAmendment, )
+    # Shared by all the new SAEs. Has to come before new_children, which uses it.
+    children_metadata: SaeMetadata = attr.ib(init=False)
     new_children: CuttableChildrenType = attr.ib(init=False)
     position: Union[Reference, StructuralReference] = attr.ib(init=False)
+    # Only for Reference positions
+    expected_type: Optional[Type[Any]] = attr.ib(init=False)
+    # Only for SAE level positions. Computed once, instead of for every SAE visited in apply_to_sae.
+    parent_position: Optional[Reference] = attr.ib(init=False)
     pure_insertion: bool = attr.ib(init=False)
 
     def sae_metadata_adder(self, _reference: Reference, sae: SubArticleElement) -> SubArticleElement:
-        if not isinstance(sae, WM_ABLE_SAE_CLASSES):
+        # Exact type lookup instead of isinstance checks (see ActConverter.article_modifier)
+        if type(sae) not in SAE_SIMPLE_TO_WM_MAP:
+            assert not isinstance(sae, SAE_WM_CLASSES)
             return sae
-        assert not isinstance(sae, SAE_WM_CLASSES)
-        children_metadata = SaeMetadata(
+        return add_metadata(sae, metadata=self.children_metadata)
+
+    @children_metadata.default
+    def _children_metadata_default(self) -> SaeMetadata:
+        return SaeMetadata(
             enforcement_date=ConcreteEnforcementDate(from_date=self.current_date)
         )
-        return add_metadata(sae, metadata=children_metadata)
 
     @new_children.default
     def _new_children_default(self) -> CuttableChildrenType:
@@ -330,9 +550,9 @@ class BlockAmendmentApplier(ModificationApplier):
         result = []
         for child in block_amendment_container.children:
             if isinstance(child, WM_ABLE_SAE_CLASSES):
-                child = child.map_recursive(Reference(), self.sae_metadata_adder, children_first=True)
-            if isinstance(child, Article):
-                child = child.map_recursive(Reference(), self.sae_metadata_adder, children_first=True)
+                child = child.map_recursive(interned_reference(None), self.sae_metadata_adder, children_first=True)
+            elif isinstance(child, Article):
+                child = child.map_recursive(interned_reference(None), self.sae_metadata_adder, children_first=True)
                 child = evolve_into(child, ArticleWM)
             result.append(child)
         return tuple(result)
@@ -342,6 +562,22 @@ class BlockAmendmentApplier(ModificationApplier):
         assert isinstance(self.modification, BlockAmendment)
         return self.modification.position
 
+    @expected_type.default
+    def _expected_type_default(self) -> Optional[Type[Any]]:
+        if not isinstance(self.position, Reference):
+            return None
+        expected_type = self.position.last_component_with_type()[1]
+        assert expected_type is not None
+        return expected_type
+
+    @parent_position.default
+    def _parent_position_default(self) -> Optional[Reference]:
+        # Same conditions as in apply
+        if self.expected_type is None or self.expected_type in (Article, Paragraph) or not issubclass(self.expected_type, SubArticleElement):
+            return None
+        assert isinstance(self.position, Reference)
+        return self.position.parent()
+
     @pure_insertion.default
     def _pure_insertion_default(self) -> bool:
         assert isinstance(self.modification, BlockAmendment)
@@ -355,14 +591,19 @@ class BlockAmendmentApplier(ModificationApplier):
         assert isinstance(self.position, Reference)
         start_ref = self.position.first_in_range()
         end_ref = self.position.last_in_range()
-        start_cut = first_matching_index(
-            children,
-            lambda c: bool(hasattr(c, 'relative_reference') and start_ref <= c.relative_reference.relative_to(parent_reference))
+        # Computed once, instead of in both of the searches below.
+        child_references = [
+            c.relative_reference.relative_to(parent_reference) if hasattr(c, 'relative_reference') else None
+            for c in children
+        ]
+        # Generator expressions, so there is no function call per child.
+        start_cut = next(
+            (i for i, r in enumerate(child_references) if r is not None and start_ref <= r),
+            len(children)
         )
-        end_cut = first_matching_index(
-            children,
-            lambda c: bool(not hasattr(c, 'relative_reference') or end_ref < c.relative_reference.relative_to(parent_reference)),
-            start=start_cut
+        end_cut = next(
+            (i for i in range(start_cut, len(children)) if child_references[i] is None or end_ref < child_references[i]),
+            len(children)
         )
         # TODO: assert between start_cut == end_cut and pure_insertion
         # However if there is an act that marked an amendment an insertion
@@ -379,9 +620,12 @@ class BlockAmendmentApplier(ModificationApplier):
         assert isinstance(self.position, StructuralReference)
         assert self.position.special is not None
         article_id = self.position.special.article_id
-        start_cut = first_matching_index(
-            children,
-            lambda c: isinstance(c, (Article, ArticleWMProxy)) and not identifier_less(c.identifier, article_id)
+        start_cut = next(
+            (
+                i for i, c in enumerate(children)
+                if isinstance(c, (Article, ArticleWMProxy)) and not identifier_less(c.identifier, article_id)
+            ),
+            len(children)
         )
         if start_cut < len(children) and children[start_cut].identifier == article_id:
             article_found = True
@@ -438,8 +682,7 @@ class BlockAmendmentApplier(ModificationApplier):
         return children[:start_cut_point] + self.new_children + children[end_cut_point:]
 
     def apply_to_sae(self, reference: Reference, sae: SaeWMType) -> SaeWMType:
-        assert isinstance(self.position, Reference)
-        if reference != self.position.parent():
+        if reference != self.parent_position:
             return sae
         assert sae.children is not None
         return attr.evolve(sae, children=self.compute_new_children(reference, sae.children))
@@ -453,22 +696,23 @@ class BlockAmendmentApplier(ModificationApplier):
 
     def apply_to_act(self, act: ActWM) -> ActWM:
         new_children = []
-        for child in self.compute_new_children(Reference(act.identifier), act.children):
+        for child in self.compute_new_children(interned_reference(act.identifier), act.children):
             assert isinstance(child, (ArticleWM, ArticleWMProxy, StructuralElement))
             new_children.append(child)
         return attr.evolve(act, children=tuple(new_children))
 
     def apply(self, act: ActWM) -> ActWM:
-        if isinstance(self.position, Reference):
-            expected_type = self.position.last_component_with_type()[1]
-            assert expected_type is not None
+        expected_type = self.expected_type
+        if expected_type is not None:
             if expected_type is Article:
                 return self.apply_to_act(act)
             if expected_type is Paragraph:
-                article_ref = Reference(act.identifier, self.position.article)
+                assert isinstance(self.position, Reference) and isinstance(self.position.article, str)
+                article_ref = interned_reference(act.identifier, self.position.article)
                 return act.map_articles(self.apply_to_article, article_ref)
             if issubclass(expected_type, SubArticleElement):
-                return act.map_saes(self.apply_to_sae, self.position.parent())
+                assert self.parent_position is not None
+                return act.map_saes(self.apply_to_sae, self.parent_position)
             raise ValueError("Unknown reference type", self.position)
         return self.apply_to_act(act)
 
@@ -483,20 +727,96 @@ class ModificationSet:
     )
 
     modifications: Tuple[Tuple[SaeWMType, SemanticData], ...]
-
-    def apply_all(self, act: ActWM, current_date: Date) -> ActWM:
-        appliers: List[ModificationApplier] = []
-        for applier_class in self.APPLIER_CLASSES:
-            appliers.extend(applier_class(m, sae, current_date) for sae, m in self.modifications if applier_class.can_apply(m))
-
-        appliers.sort(key=lambda x: x.priority, reverse=True)
-
-        for applier in appliers:
+    current_date: Date
+    # Created once, because both apply_all and needs_semantic_parsing need them
+    appliers: Tuple[List[TextReplacementApplier], List[ModificationApplier]] = attr.ib(init=False)
+
+    @appliers.default
+    def _appliers_default(self) -> Tuple[List[TextReplacementApplier], List[ModificationApplier]]:
+        return self.create_appliers()
+
+    def unique_modifications(self) -> Iterator[Tuple[SaeWMType, SemanticData]]:
+        # The very same amendment or repeal may be parsed from more than one SAE of the
+        # amending act. Applying it again would either do nothing but warn, or worse,
+        # replace the text a second time.
+        seen_text_modifications: Set[SemanticData] = set()
+        for sae, m in self.modifications:
+            if isinstance(m, (TextAmendment, Repeal)):
+                if m in seen_text_modifications:
+                    continue
+                seen_text_modifications.add(m)
+            yield sae, m
+
+    def create_appliers(self) -> Tuple[List[TextReplacementApplier], List[ModificationApplier]]:
+        # The applier classes accept disjoint sets of modifications, so a single pass over
+        # the modifications is enough. The appliers are still grouped by class, in class order.
+        appliers_per_class: Dict[Type[ModificationApplier], List[ModificationApplier]] = {c: [] for c in self.APPLIER_CLASSES}
+        for sae, m in self.unique_modifications():
+            applier_class = self.applier_class_for(m)
+            if applier_class is not None:
+                appliers_per_class[applier_class].append(applier_class(m, sae, self.current_date))
+        text_replacement_appliers: List[TextReplacementApplier] = []
+        other_appliers: List[ModificationApplier] = []
+        for appliers in appliers_per_class.values():
+            for applier in appliers:
+                if isinstance(applier, TextReplacementApplier):
+                    text_replacement_appliers.append(applier)
+                else:
+                    other_appliers.append(applier)
+        return text_replacement_appliers, other_appliers
+
+    def apply_all(self, act: ActWM) -> ActWM:
+        text_replacement_appliers, other_appliers = self.appliers
+
+        # Only text replacements have a nonzero priority, so only they need ordering.
+        # Bucketing by priority keeps the original order of equal priority appliers,
+        # just like a stable sort would.
+        buckets: Dict[int, List[TextReplacementApplier]] = defaultdict(list)
+        for text_replacement_applier in text_replacement_appliers:
+            buckets[text_replacement_applier.priority].append(text_replacement_applier)
+        text_replacement_appliers = [a for priority in sorted(buckets, reverse=True) for a in buckets[priority]]
+
+        # Text replacements are done in a single pass
+        act = TextReplacementApplier.apply_multiple(text_replacement_appliers, act)
+        # So are the title amendments, which all come before the rest (see APPLIER_CLASSES)
+        title_appliers = [a for a in other_appliers if isinstance(a, ArticleTitleAmendmentApplier)]
+        act = ArticleTitleAmendmentApplier.apply_multiple(title_appliers, act)
+        # Runs of SAE repeals are also done in a single pass
+        sae_repeal_appliers: List[RepealApplier] = []
+        for applier in other_appliers:
+            if isinstance(applier, ArticleTitleAmendmentApplier):
+                continue
+            if isinstance(applier, RepealApplier) and applier.is_sae_repeal():
+                sae_repeal_appliers.append(applier)
+                continue
+            act = RepealApplier.apply_multiple_sae_repeals(sae_repeal_appliers, act)
+            sae_repeal_appliers = []
             act = applier.apply(act)
+        act = RepealApplier.apply_multiple_sae_repeals(sae_repeal_appliers, act)
+
+        for applier in (*text_replacement_appliers, *other_appliers):
             if not applier.applied:
                 print("WARN: Could not apply ", applier.modification)
         return act
 
+    @classmethod
+    def applier_class_for(cls, modification: SemanticData) -> Optional[Type[ModificationApplier]]:
+        # Only the classes that handle the exact type of the modification are asked.
+        # That is a single class, except for Repeals.
+        for applier_class in applier_classes_for_type(type(modification)):
+            if applier_class.can_apply(modification):
+                return applier_class
+        return None
+
+    def needs_semantic_parsing(self) -> bool:
+        text_replacement_appliers, other_appliers = self.appliers
+        return any(applier.CREATES_UNPARSED_SAES for applier in (*text_replacement_appliers, *other_appliers))
+
+
+@lru_cache(maxsize=None)
+def applier_classes_for_type(modification_type: Type[SemanticData]) -> Tuple[Type[ModificationApplier], ...]:
+    return tuple(c for c in ModificationSet.APPLIER_CLASSES if issubclass(modification_type, c.MODIFICATION_TYPES))
+
 
 @attr.s(slots=True, auto_attribs=True)
 class AmendmentAndRepealExtractor:
@@ -504,13 +824,26 @@ class AmendmentAndRepealExtractor:
     act_identifier: str
     modifications_per_act: Dict[str, List[Tuple[SaeWMType, SemanticData]]] = \
         attr.ib(init=False, factory=lambda: defaultdict(list))
+    # An act only has a handful of different enforcement dates. Keyed by value, because
+    # articles loaded from the object storage have a separate instance in every SAE.
+    in_force_cache: Dict[ConcreteEnforcementDate, bool] = attr.ib(init=False, factory=dict)
+
+    def is_in_force(self, enforcement_date: ConcreteEnforcementDate) -> bool:
+        result = self.in_force_cache.get(enforcement_date)
+        if result is None:
+            result = enforcement_date.is_in_force_at_date(self.at_date)
+            self.in_force_cache[enforcement_date] = result
+        return result
 
     def sae_walker(self, reference: Reference, sae: SaeWMType) -> SaeWMType:
-        if sae.semantic_data is None:
+        if not sae.semantic_data:
             return sae
         assert sae.metadata.enforcement_date is not None
-        if not sae.metadata.enforcement_date.is_in_force_at_date(self.at_date):
+        if not self.is_in_force(sae.metadata.enforcement_date):
             return sae
+        modifications_per_act = self.modifications_per_act
+        # The same (immutable) repeal is used for all amendments in the SAE
+        self_repeal: Optional[Tuple[SaeWMType, SemanticData]] = None
         for semantic_data_element in sae.semantic_data:
             if isinstance(semantic_data_element, EnforcementDate):
                 continue
@@ -520,49 +853,99 @@ class AmendmentAndRepealExtractor:
             # This will fail very fast and very loudly if there is a problem.
             modified_ref = semantic_data_element.position  # type: ignore
             assert modified_ref.act is not None
-            self.modifications_per_act[modified_ref.act].append((sae, semantic_data_element))
-            self.modifications_per_act[self.act_identifier].append((sae, Repeal(position=reference)))
+            modifications_per_act[modified_ref.act].append((sae, semantic_data_element))
+            if self_repeal is None:
+                self_repeal = (sae, Repeal(position=reference))
+            modifications_per_act[self.act_identifier].append(self_repeal)
         return sae
 
     @classmethod
-    def get_amendments_and_repeals(cls, act: ActWM, at_date: Date) -> Dict[str, List[Tuple[SaeWMType, SemanticData]]]:
+    def get_amendments_and_repeals(cls, act: ActWM, at_date: Date) -> Dict[str, Tuple[Tuple[SaeWMType, SemanticData], ...]]:
         instance = cls(at_date, act.identifier)
         act.map_saes(instance.sae_walker)
-        return instance.modifications_per_act
+        # Converted once here, so that ModificationSet can use them as-is
+        return {act_id: tuple(modifications) for act_id, modifications in instance.modifications_per_act.items()}
 
 
-class ActConverter:
-    @classmethod
-    def sae_metadata_adder(cls, _reference: Reference, sae: SubArticleElement) -> SubArticleElement:
-        if not isinstance(sae, WM_ABLE_SAE_CLASSES):
-            return sae
-        assert not isinstance(sae, SAE_WM_CLASSES)
-        return add_metadata(sae)
+@lru_cache(maxsize=None)
+def hun_law_source_hash() -> str:
+    # Pickled Acts are only valid with the same class layout they were pickled with.
+    # They contain classes from all over hun_law (e.g. Date from hun_law.utils),
+    # so the whole package is hashed, not just hun_law.structure.
+    hasher = md5()
+    for source_path in sorted(Path(inspect.getfile(hun_law)).parent.rglob('*.py')):
+        hasher.update(source_path.read_bytes())
+    return hasher.hexdigest()
+
 
+class ActConverter:
     @classmethod
-    def article_modifier(cls, article: Article) -> ArticleWM:
-        article = article.map_recursive(Reference(), cls.sae_metadata_adder, children_first=True)
+    def article_modifier(cls, article: Article, act_identifier: str, enforcement_set: EnforcementDateSet) -> ArticleWM:
+        # Metadata is added with the enforcement dates already filled in, so that
+        # the article doesn't have to be walked (and rebuilt) a second time for them.
+        def sae_metadata_adder(reference: Reference, sae: SubArticleElement) -> SubArticleElement:
+            # A single dict lookup on the exact type, instead of two isinstance checks with class tuples.
+            # The keys are exactly the WM-able classes, so SAEs that already have metadata are not in it.
+            if type(sae) not in SAE_SIMPLE_TO_WM_MAP:
+                assert not isinstance(sae, SAE_WM_CLASSES)
+                return sae
+            return add_metadata(sae, metadata=enforcement_set.metadata_for_reference(reference))
+        article = article.map_recursive(interned_reference(act_identifier), sae_metadata_adder, children_first=True)
         article_wm: ArticleWM = evolve_into(article, ArticleWM)
         return article_wm
 
     @classmethod
     def load_hun_law_act(cls, path: Path) -> Act:
         if path.suffix == '.gz':
-            with gzip.open(path, 'rt') as f:
-                the_dict = json.load(f)
+            the_dict = json_loads(read_gzip_file(path))
         elif path.suffix == '.yaml':
-            with open(path, 'rt') as f:
-                the_dict = yaml.load(f, Loader=yaml.Loader)
+            # The whole document is given to the loader at once: libyaml decodes the
+            # bytes itself, instead of reading a decoding text stream chunk by chunk.
+            the_dict = yaml.load(path.read_bytes(), Loader=YAML_LOADER)
         else:
-            with open(path, 'rt') as f:
-                the_dict = json.load(f)
+            the_dict = json_loads(path.read_bytes())
         result: Act = act_converter.to_object(the_dict)
         return result
 
+    @classmethod
+    def load_hun_law_act_cached(cls, path: Path) -> Act:
+        # Converting the parsed dict to an Act is by far the slowest part of loading,
+        # so the result is cached in pickled form. Only meant for files that are loaded
+        # over and over again, i.e. the ones in the database.
+        # There is a single cache entry per source file, overwritten when it gets stale.
+        cache_path = cls.hun_law_act_cache_path(path)
+        validity_key = cls.hun_law_act_cache_validity_key(path)
+        if cache_path.is_file():
+            with cache_path.open('rb') as f:
+                if pickle.load(f) == validity_key:
+                    cached_result: Act = pickle.load(f)
+                    return cached_result
+
+        result = cls.load_hun_law_act(path)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Written to a temporary file first, so other processes never see a half-written cache
+        tmp_path = cache_path.with_name('{}.{}.tmp'.format(cache_path.name, os.getpid()))
+        with tmp_path.open('wb') as f:
+            pickle.dump(validity_key, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(cache_path)
+        return result
+
+    @classmethod
+    def hun_law_act_cache_path(cls, path: Path) -> Path:
+        key = md5(str(path.resolve()).encode('utf-8')).hexdigest()
+        return AJDBConfig.STORAGE_PATH / 'hun_law_act_cache' / key[0] / key[1] / (key[2:] + '.pickle')
+
+    @classmethod
+    def hun_law_act_cache_validity_key(cls, path: Path) -> str:
+        # Based on the contents, because the modification time and size can stay the same
+        # after a rewrite. Hashing the file is cheap compared to parsing and converting it.
+        return '{}:{}'.format(md5(path.read_bytes()).hexdigest(), hun_law_source_hash())
+
     @classmethod
     def save_hun_law_act_json_gz(cls, path: Path, act: Act) -> None:
-        with gzip.open(path, 'wt') as f:
-            json.dump(act_converter.to_dict(act), f, indent='  ', sort_keys=True, ensure_ascii=False)
+        with gzip.open(path, 'wb', compresslevel=GZIP_COMPRESSLEVEL) as f:
+            f.write(json_dumps_indented(act_converter.to_dict(act)))
 
     @classmethod
     def convert_hun_law_act(cls, act: Act) -> ActWM:
@@ -571,10 +954,10 @@ class ActConverter:
         new_children: List[Union[StructuralElement, ArticleWM]] = []
         for c in act.children:
             if isinstance(c, Article):
-                new_children.append(cls.article_modifier(c))
+                new_children.append(cls.article_modifier(c, act.identifier, enforcement_set))
             else:
                 new_children.append(c)
-        result = ActWM(
+        return ActWM(
             identifier=act.identifier,
             publication_date=act.publication_date,
             subject=act.subject,
@@ -582,10 +965,6 @@ class ActConverter:
             children=tuple(new_children),
             interesting_dates=enforcement_set.interesting_dates(),
         )
-        # TODO: Use Somehting like EnforcementDateSet.update_act instead
-        #       it should set the interesting dates
-        result = result.map_articles(enforcement_set.article_modifier)
-        return result
 
 
 class ActSetAmendmentApplier:
@@ -601,27 +980,67 @@ class ActSetAmendmentApplier:
         return act.map_articles(article_semantics_adder)
 
     @classmethod
-    def apply_single_act(cls, act_set: ActSet, amending_act: ActWM, date: Date) -> ActSet:
+    @contextmanager
+    def create_executor(cls) -> Iterator[Optional[ProcessPoolExecutor]]:
+        # The worker processes only live while the executor is used, and they
+        # always match the currently configured number of processes.
+        if AJDBConfig.WORKER_PROCESSES <= 1:
+            yield None
+            return
+        with ProcessPoolExecutor(AJDBConfig.WORKER_PROCESSES) as executor:
+            yield executor
+
+    @classmethod
+    def apply_modifications(cls, act: ActWM, modifications: Tuple[Tuple[SaeWMType, SemanticData], ...], date: Date) -> ActWM:
+        modification_set = ModificationSet(modifications, date)
+        act = modification_set.apply_all(act)
+        # The semantic parser only parses SAEs without semantic data, but it still
+        # walks the whole act, so don't call it when there is nothing to parse.
+        if modification_set.needs_semantic_parsing():
+            act = cls.add_semantics_to_act(act)
+        return act
+
+    @classmethod
+    def apply_single_act(cls, act_set: ActSet, amending_act: ActWM, date: Date, executor: Optional[ProcessPoolExecutor]) -> ActSet:
         extracted_modifications = AmendmentAndRepealExtractor.get_amendments_and_repeals(amending_act, date)
         if not extracted_modifications:
             return act_set
 
-        modified_acts: List[ActWM] = []
+        jobs: List[Tuple[ActWM, Tuple[Tuple[SaeWMType, SemanticData], ...]]] = []
         for act_id, modifications in extracted_modifications.items():
             if not act_set.has_act(act_id):
                 continue
             act = act_set.act(act_id)
             if act.identifier != amending_act.identifier:
                 print("AMENDING ", act.identifier, "WITH", amending_act.identifier)
+            jobs.append((act, modifications))
 
-            modification_set = ModificationSet(tuple(modifications))
-            act = modification_set.apply_all(act, date)
-            act = cls.add_semantics_to_act(act)
-            modified_acts.append(act)
+        # Different acts are modified completely independently, so they can be done in parallel.
+        if executor is None or len(jobs) < 2:
+            modified_acts = [cls.apply_modifications(act, modifications, date) for act, modifications in jobs]
+        else:
+            # The first act is modified in this process, while the workers are busy with the rest.
+            futures = [
+                executor.submit(_apply_modifications_in_worker, AJDBConfig.STORAGE_PATH, act, modifications, date)
+                for act, modifications in jobs[1:]
+            ]
+            modified_acts = [cls.apply_modifications(jobs[0][0], jobs[0][1], date)]
+            modified_acts.extend(future.result() for future in futures)
         return act_set.replace_acts(modified_acts)
 
     @classmethod
-    def apply_all_amendments(cls, act_set: ActSet, date: Date) -> ActSet:
+    def apply_all_amendments(cls, act_set: ActSet, date: Date, executor: Optional[ProcessPoolExecutor] = None) -> ActSet:
         for act in act_set.interesting_acts_at_date(date):
-            act_set = cls.apply_single_act(act_set, act, date)
+            act_set = cls.apply_single_act(act_set, act, date, executor)
         return act_set
+
+
+def _apply_modifications_in_worker(
+    storage_path: Path,
+    act: ActWM,
+    modifications: Tuple[Tuple[SaeWMType, SemanticData], ...],
+    date: Date
+) -> ActWM:
+    # Spawned (instead of forked) workers don't see the storage path set at runtime (e.g. in tests)
+    AJDBConfig.STORAGE_PATH = storage_path
+    return ActSetAmendmentApplier.apply_modifications(act, modifications, date)
@@ -6,3 +6,5 @@ _THIS_DIR = Path(__file__).parent
 
 class AJDBConfig:
     STORAGE_PATH = _THIS_DIR.parent / 'database'
+    # Number of processes used for amending acts. 1 means everything is done in the main process.
+    WORKER_PROCESSES = 1
@@ -1,15 +1,16 @@
 # Copyright 2020, Alex Badics, All Rights Reserved
-import json
-import gzip
+from typing import Optional
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import gzip
 
 from hun_law.utils import Date
 from hun_law import dict2object
 from hun_law.structure import Act
 
 from ajdb.config import AJDBConfig
-from ajdb.structure import ActSet
-from ajdb.utils import LruDict
+from ajdb.structure import ActSet, ActWM
+from ajdb.utils import TwoRandomChoiceDict, json_loads, json_dumps_indented, read_gzip_file, GZIP_COMPRESSLEVEL
 from ajdb.amender import ActConverter, ActSetAmendmentApplier
 from ajdb.indexer import ReferenceReindexer
 
@@ -21,7 +22,7 @@ from ajdb.indexer import ReferenceReindexer
 
 
 class Database:
-    CACHE: LruDict[Date, ActSet] = LruDict(16)
+    CACHE: TwoRandomChoiceDict[Date, ActSet] = TwoRandomChoiceDict(16)
     ACT_SET_CONVERTER = dict2object.get_converter(ActSet)
 
     @classmethod
@@ -44,28 +45,32 @@ class Database:
             return act_set
         acts_to_add = []
 
-        for act_path in cls.hun_law_acts_path(date).iterdir():
-            act_raw = ActConverter.load_hun_law_act(act_path)
-            act = ActConverter.convert_hun_law_act(act_raw)
+        for act_path in acts_to_add_path.iterdir():
+            act = cls.load_and_convert_hun_law_act(act_path)
             print("Adding {} to the act set".format(act.identifier))
             acts_to_add.append(act)
         if not acts_to_add:
             return act_set
         return act_set.add_acts(acts_to_add)
 
+    @classmethod
+    def load_and_convert_hun_law_act(cls, path: Path) -> ActWM:
+        return ActConverter.convert_hun_law_act(ActConverter.load_hun_law_act_cached(path))
+
     @classmethod
     def recompute_date_range(cls, from_date: Date, to_date: Date) -> None:
-        date = from_date
-        while date <= to_date:
-            cls.recompute_at_date(date)
-            date = date.add_days(1)
+        with ActSetAmendmentApplier.create_executor() as executor:
+            date = from_date
+            while date <= to_date:
+                cls.recompute_at_date(date, executor)
+                date = date.add_days(1)
 
     @classmethod
-    def recompute_at_date(cls, date: Date) -> None:
+    def recompute_at_date(cls, date: Date, executor: Optional[ProcessPoolExecutor] = None) -> None:
         act_set = cls.load_act_set(date.add_days(-1))
 
         act_set = cls.add_relevant_hun_law_acts(act_set, date)
-        act_set = ActSetAmendmentApplier.apply_all_amendments(act_set, date)
+        act_set = ActSetAmendmentApplier.apply_all_amendments(act_set, date, executor)
         if act_set.has_unsaved():
             act_set = ReferenceReindexer.reindex_act_set(act_set)
         act_set = act_set.save_all_acts()
@@ -80,8 +85,7 @@ class Database:
         if not path.is_file():
             return ActSet()
 
-        with gzip.open(path, 'rt') as f:
-            result: ActSet = cls.ACT_SET_CONVERTER.to_object(json.load(f))
+        result: ActSet = cls.ACT_SET_CONVERTER.to_object(json_loads(read_gzip_file(path)))
 
         cls.CACHE[date] = result
         return result
@@ -91,9 +95,10 @@ class Database:
         cls.CACHE[date] = act_set
         path = cls.states_path(date)
         path.parent.mkdir(parents=True, exist_ok=True)
-        with gzip.open(path, 'wt') as f:
-            act_set_dict = cls.ACT_SET_CONVERTER.to_dict(act_set)
-            json.dump(act_set_dict, f, indent='  ', sort_keys=True, ensure_ascii=False)
+        # The act set only holds proxies to the acts, so serializing it in one go is cheap
+        act_set_bytes = json_dumps_indented(cls.ACT_SET_CONVERTER.to_dict(act_set))
+        with gzip.open(path, 'wb', compresslevel=GZIP_COMPRESSLEVEL) as f:
+            f.write(act_set_bytes)
 
     @classmethod
     def hun_law_acts_path(cls, date: Date) -> Path:
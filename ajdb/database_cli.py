@@ -8,6 +8,7 @@ import sys
 from hun_law.utils import Date
 from hun_law.output.txt import write_txt
 
+from ajdb.config import AJDBConfig
 from ajdb.database import Database
 
 
@@ -78,9 +79,16 @@ class RecomputeAction(DatabaseCLIAction):
             type=Date.from_simple_string,
             help="End of the date range [Inclusive]"
         )
+        argument_parser.add_argument(
+            '-j', '--jobs',
+            default=1,
+            type=int,
+            help="Number of worker processes used for applying amendments"
+        )
 
     @classmethod
     def action(cls, params: argparse.Namespace) -> None:
+        AJDBConfig.WORKER_PROCESSES = params.jobs
         print("Recomputing database between {} and {}".format(params.from_date, params.to_date))
         Database.recompute_date_range(params.from_date, params.to_date)
 
@@ -9,7 +9,7 @@ import attr
 
 from hun_law import dict2object
 from ajdb.config import AJDBConfig
-from ajdb.utils import LruDict
+from ajdb.utils import LruDict, json_loads, read_gzip_file, GZIP_COMPRESSLEVEL
 
 
 @attr.s(slots=True, frozen=True, auto_attribs=True)
@@ -24,7 +24,8 @@ class ObjectStorage:
             key = md5(data_as_json_bytes).hexdigest()
         object_path = self.get_object_path(key)
         object_path.parent.mkdir(parents=True, exist_ok=True)
-        with gzip.open(object_path, 'wb') as f:
+        # The key depends on the uncompressed bytes only, so the compression level can be anything.
+        with gzip.open(object_path, 'wb', compresslevel=GZIP_COMPRESSLEVEL) as f:
             f.write(data_as_json_bytes)
         return key
 
@@ -32,8 +33,7 @@ class ObjectStorage:
         object_path = self.get_object_path(key)
         if not object_path.is_file():
             raise KeyError("Object {}/{} does not exist".format(self.prefix, key))
-        with gzip.open(self.get_object_path(key), 'r') as f:
-            return json.load(f)
+        return json_loads(read_gzip_file(object_path))
 
     def get_object_path(self, key: str) -> Path:
         return AJDBConfig.STORAGE_PATH / self.prefix / key[0] / key[1] / (key[2:] + '.json.gz')
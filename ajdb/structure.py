@@ -3,7 +3,7 @@
 import sys
 import inspect
 import gc
-from typing import Tuple, Union, Optional, Callable, Dict, Iterable, Any, Sequence, List, ClassVar
+from typing import Tuple, Union, Optional, Callable, Dict, Iterable, Any, Sequence, List, ClassVar, Set
 from collections import defaultdict
 
 import attr
@@ -16,7 +16,7 @@ from hun_law.structure import Act, Article, \
     StructuralElement, \
     EnforcementDate, EnforcementDateTypes, DaysAfterPublication, DayInMonthAfterPublication
 
-from ajdb.utils import evolve_into
+from ajdb.utils import evolve_into, interned_reference
 from ajdb.object_storage import CachedTypedObjectStorage
 
 
@@ -183,7 +183,7 @@ class ArticleWMProxy:
 
     @property
     def relative_reference(self) -> 'Reference':
-        return Reference(article=self.identifier)
+        return interned_reference(None, self.identifier)
 
 
 @attr.s(slots=True, frozen=True, auto_attribs=True, kw_only=True)
@@ -197,6 +197,9 @@ class ActWM:
 
     articles: Tuple[Union[ArticleWM, ArticleWMProxy], ...] = attr.ib(init=False)
     articles_map: Dict[str, Union[ArticleWM, ArticleWMProxy]] = attr.ib(init=False)
+    # Article identifier -> indices in children. Used for quickly finding
+    # the single article a filter reference can match in map_* functions.
+    article_indices: Dict[str, Tuple[int, ...]] = attr.ib(init=False, eq=False, repr=False)
 
     @children.validator
     def _children_validator(self, _attribute: Any, children: Tuple[Paragraph, ...]) -> None:
@@ -213,30 +216,70 @@ class ActWM:
     def _articles_map_default(self) -> Dict[str, Union[ArticleWM, ArticleWMProxy]]:
         return {c.identifier: c for c in self.articles}
 
-    def map_articles(
+    @article_indices.default
+    def _article_indices_default(self) -> Dict[str, Tuple[int, ...]]:
+        result: Dict[str, List[int]] = defaultdict(list)
+        for index, child in enumerate(self.children):
+            if isinstance(child, (ArticleWM, ArticleWMProxy)):
+                result[child.identifier].append(index)
+        return {k: tuple(v) for k, v in result.items()}
+
+    def _indices_to_visit(self, filter_for_reference: Optional[Reference]) -> Iterable[int]:
+        if filter_for_reference is not None and isinstance(filter_for_reference.article, str):
+            # Only a single article can match, no need to go through all children.
+            return self.article_indices.get(filter_for_reference.article, ())
+        return range(len(self.children))
+
+    def _indices_to_visit_multiple(self, filters_for_reference: Iterable[Reference]) -> Iterable[int]:
+        result: Set[int] = set()
+        for filter_for_reference in filters_for_reference:
+            if not isinstance(filter_for_reference.article, str):
+                return range(len(self.children))
+            result.update(self.article_indices.get(filter_for_reference.article, ()))
+        return sorted(result)
+
+    def _map_articles_at(
         self,
+        indices: Iterable[int],
         modifier: Callable[[Reference, ArticleWM], ArticleWM],
         filter_for_reference: Optional[Reference] = None,
     ) -> 'ActWM':
-        new_children = []
-        children_changed = False
-        for child in self.children:
-            if isinstance(child, (ArticleWM, ArticleWMProxy)):
-                article_reference = Reference(self.identifier, child.identifier)
-                if filter_for_reference is None or filter_for_reference.contains(article_reference):
-                    if isinstance(child, ArticleWM):
-                        child_to_modify = child
-                    else:
-                        child_to_modify = child.article
-                    new_child = modifier(article_reference, child_to_modify)
-                    if new_child is not child_to_modify:
-                        child = new_child
-                        children_changed = True
-            new_children.append(child)
-        if not children_changed:
+        new_children: Optional[List[Union[StructuralElement, ArticleWM, ArticleWMProxy]]] = None
+        for index in indices:
+            child = self.children[index]
+            if not isinstance(child, (ArticleWM, ArticleWMProxy)):
+                continue
+            article_reference = interned_reference(self.identifier, child.identifier)
+            if filter_for_reference is not None and not filter_for_reference.contains(article_reference):
+                continue
+            if isinstance(child, ArticleWM):
+                child_to_modify = child
+            else:
+                child_to_modify = child.article
+            new_child = modifier(article_reference, child_to_modify)
+            if new_child is not child_to_modify:
+                if new_children is None:
+                    new_children = list(self.children)
+                new_children[index] = new_child
+        if new_children is None:
             return self
         return attr.evolve(self, children=tuple(new_children))
 
+    def map_articles(
+        self,
+        modifier: Callable[[Reference, ArticleWM], ArticleWM],
+        filter_for_reference: Optional[Reference] = None,
+    ) -> 'ActWM':
+        return self._map_articles_at(self._indices_to_visit(filter_for_reference), modifier, filter_for_reference)
+
+    def map_articles_multi(
+        self,
+        modifier: Callable[[Reference, ArticleWM], ArticleWM],
+        filters_for_reference: Sequence[Reference],
+    ) -> 'ActWM':
+        # Like map_saes_multi, but for articles: the modifier has to do the filtering itself.
+        return self._map_articles_at(self._indices_to_visit_multiple(filters_for_reference), modifier)
+
     def map_saes(
         self,
         modifier: Callable[[Reference, SaeWMType], SaeWMType],
@@ -244,8 +287,23 @@ class ActWM:
         children_first: bool = False,
     ) -> 'ActWM':
         def article_modifier(_reference: Reference, article: ArticleWM) -> ArticleWM:
-            return article.map_recursive_wm(Reference(self.identifier), modifier, filter_for_reference, children_first)
-        return self.map_articles(article_modifier)
+            return article.map_recursive_wm(interned_reference(self.identifier), modifier, filter_for_reference, children_first)
+        # The filter is only used for selecting the articles to visit here: what's inside
+        # them is filtered by map_recursive_wm itself.
+        return self._map_articles_at(self._indices_to_visit(filter_for_reference), article_modifier)
+
+    def map_saes_multi(
+        self,
+        modifier: Callable[[Reference, SaeWMType], SaeWMType],
+        filters_for_reference: Sequence[Reference],
+        children_first: bool = False,
+    ) -> 'ActWM':
+        # Walks all articles that could match any of the filters at once, instead of
+        # calling map_saes for each filter. The modifier gets called for every SAE
+        # in those articles, it has to do the actual filtering itself.
+        def article_modifier(_reference: Reference, article: ArticleWM) -> ArticleWM:
+            return article.map_recursive_wm(interned_reference(self.identifier), modifier, None, children_first)
+        return self._map_articles_at(self._indices_to_visit_multiple(filters_for_reference), article_modifier)
 
     def to_simple_act(self) -> Act:
         new_children: Tuple[Union[StructuralElement, Article], ...] = tuple(
@@ -368,6 +426,8 @@ class ActSet:
         return dict(self.reference_index)
 
     def interesting_acts_at_date(self, date: Date) -> Iterable[ActWM]:
+        # Every ActSet is only queried once per date in practice (see Database.recompute_at_date),
+        # so a date -> acts index would cost just as much to build as this scan.
         for act in self.acts:
             if date in act.interesting_dates:
                 if isinstance(act, ActWM):
@@ -1,18 +1,46 @@
 # Copyright 2020, Alex Badics, All Rights Reserved
-from typing import Iterable, Sequence, Any, Callable, Optional, Type, TypeVar, MutableMapping
+from typing import Iterable, Iterator, Sequence, Any, Callable, Optional, Type, TypeVar, MutableMapping, Dict, Tuple, List
 from collections import OrderedDict
+from pathlib import Path
+import json
+import gzip
+import random
 
 import attr
 
 from hun_law.structure import Act, SubArticleElement, BlockAmendmentContainer, Reference
 
+try:
+    # Only available on CPython
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    # ISA-L decompresses gzip a lot faster than zlib. Only used for reading,
+    # since its compression levels are not the same as zlib's.
+    from isal import igzip
+    HAS_ISAL = True
+except ImportError:
+    HAS_ISAL = False
+
+# Used for writing all gzip files. The default (9) is a lot slower than 6, for very little gain in size.
+GZIP_COMPRESSLEVEL = 6
+
 
 def iterate_all_saes_of_sae(sae: SubArticleElement) -> Iterable[SubArticleElement]:
-    yield sae
-    if sae.children:
-        for child in sae.children:
-            if isinstance(child, SubArticleElement) and not isinstance(child, BlockAmendmentContainer):
-                yield from iterate_all_saes_of_sae(child)
+    # Explicit stack instead of recursive generators: every level of "yield from"
+    # adds overhead to every single element yielded from below it.
+    stack = [sae]
+    while stack:
+        sae = stack.pop()
+        yield sae
+        if sae.children:
+            stack.extend(
+                child for child in reversed(sae.children)
+                if isinstance(child, SubArticleElement) and not isinstance(child, BlockAmendmentContainer)
+            )
 
 
 def iterate_all_saes_of_act(act: Act) -> Iterable[SubArticleElement]:
@@ -21,13 +49,6 @@ def iterate_all_saes_of_act(act: Act) -> Iterable[SubArticleElement]:
             yield from iterate_all_saes_of_sae(paragraph)
 
 
-def first_matching_index(data: Sequence[Any], filter_fn: Callable[[Any], bool], start: int = 0) -> int:
-    for index in range(start, len(data)):
-        if filter_fn(data[index]):
-            return index
-    return len(data)
-
-
 def last_matching_index(data: Sequence[Any], filter_fn: Callable[[Any], bool], start: Optional[int] = 0) -> int:
     if start is None:
         start = len(data) - 1
@@ -50,6 +71,48 @@ def evolve_into(inst: Any, cls: Type, **changes: Any) -> Any:
     return cls(**changes)
 
 
+def json_loads(data: bytes) -> Any:
+    # orjson is a lot faster than the built-in json module, and it parses bytes
+    # directly, so there is no need for a separate utf-8 decoding step either.
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def read_gzip_file(path: Path) -> bytes:
+    # Reading the whole file and decompressing it in one go is faster than going through GzipFile
+    # The isal version is untyped, this annotation makes mypy accept it (a type: ignore
+    # would be reported as unused whenever isal is not installed).
+    decompress: Callable[[bytes], bytes] = igzip.decompress if HAS_ISAL else gzip.decompress
+    return decompress(path.read_bytes())
+
+
+def json_dumps_indented(data: Any) -> bytes:
+    # Human readable, sorted output. The exact formatting is not the same with the two
+    # libraries, so don't use this where the bytes themselves matter (e.g. hashing).
+    if HAS_ORJSON:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2)
+    return json.dumps(data, indent='  ', sort_keys=True, ensure_ascii=False).encode('utf-8')
+
+
+_INTERNED_REFERENCES: Dict[Tuple[Optional[str], Optional[str]], Reference] = {}
+_INTERNED_REFERENCES_MAX_SIZE = 100000
+
+
+def interned_reference(act: Optional[str], article: Optional[str] = None) -> Reference:
+    # The same act and article references get created over and over again while
+    # walking acts. References are immutable, so a single instance can be shared,
+    # which also makes the "is" shortcut in dict and tuple comparisons kick in.
+    key = (act, article)
+    result = _INTERNED_REFERENCES.get(key)
+    if result is None:
+        if len(_INTERNED_REFERENCES) >= _INTERNED_REFERENCES_MAX_SIZE:
+            _INTERNED_REFERENCES.clear()
+        result = Reference(act, article)
+        _INTERNED_REFERENCES[key] = result
+    return result
+
+
 _KT = TypeVar('_KT')
 _VT = TypeVar('_VT')
 
@@ -82,6 +145,58 @@ class LruDict(OrderedDict, MutableMapping[_KT, _VT]):
             return default
 
 
+class TwoRandomChoiceDict(MutableMapping[_KT, _VT]):
+    # Approximate LRU: when full, two random entries are picked, and the one used
+    # less recently is evicted. Hits only update a counter, instead of reordering
+    # a linked list like LruDict does.
+    def __init__(self, max_elements: int):
+        self.max_elements = max_elements
+        self.entries: List[List[Any]] = []  # [key, value, last use tick]
+        self.indices: Dict[_KT, int] = {}
+        self.tick = 0
+        self.random = random.Random(0)
+
+    def __getitem__(self, key: _KT) -> _VT:
+        entry = self.entries[self.indices[key]]
+        self.tick += 1
+        entry[2] = self.tick
+        result: _VT = entry[1]
+        return result
+
+    def __setitem__(self, key: _KT, value: _VT) -> None:
+        self.tick += 1
+        index = self.indices.get(key)
+        if index is not None:
+            self.entries[index][1] = value
+            self.entries[index][2] = self.tick
+            return
+        if self.entries and len(self.entries) >= self.max_elements:
+            candidates = self.random.sample(self.entries, min(2, len(self.entries)))
+            del self[min(candidates, key=lambda entry: entry[2])[0]]
+        self.indices[key] = len(self.entries)
+        self.entries.append([key, value, self.tick])
+
+    def __delitem__(self, key: _KT) -> None:
+        index = self.indices.pop(key)
+        last = self.entries.pop()
+        if index < len(self.entries):
+            self.entries[index] = last
+            self.indices[last[0]] = index
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.indices
+
+    def __iter__(self) -> Iterator[_KT]:
+        return iter(list(self.indices))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.indices.clear()
+
+
 def reference_as_hungarian_string(reference: Reference) -> str:
     #pylint: disable=too-many-branches
     parts = []
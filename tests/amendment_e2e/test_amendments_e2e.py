@@ -3,6 +3,8 @@ from typing import Iterable, Any
 from pathlib import Path
 import difflib
 import io
+import subprocess
+import sys
 import yaml
 
 # For typing only
@@ -21,6 +23,32 @@ from ajdb.amender import ActConverter
 from ajdb.database import Database
 
 THIS_DIR = Path(__file__).parent
+REPO_ROOT = THIS_DIR.parent.parent
+
+# Run in a separate interpreter, because the tests themselves may be run in daemonic
+# processes (pytest --workers), which are not allowed to start the amendment worker pool.
+RECOMPUTE_SCRIPT = """
+import sys
+from pathlib import Path
+from hun_law.utils import Date
+from ajdb.config import AJDBConfig
+from ajdb.database import Database
+AJDBConfig.STORAGE_PATH = Path(sys.argv[1])
+AJDBConfig.WORKER_PROCESSES = int(sys.argv[2])
+Database.recompute_date_range(Date(2009, 1, 1), Date(int(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5])))
+"""
+
+
+def recompute_in_subprocess(storage_path: Path, worker_processes: int, target_date: Date) -> None:
+    subprocess.run(
+        [
+            sys.executable, '-c', RECOMPUTE_SCRIPT,
+            str(storage_path), str(worker_processes),
+            str(target_date.year), str(target_date.month), str(target_date.day),
+        ],
+        cwd=REPO_ROOT,
+        check=True,
+    )
 
 
 def act_set_testcase_provider() -> Iterable[Any]:
@@ -39,9 +67,12 @@ def act_as_text(act: Act) -> str:
 
 
 @pytest.mark.parametrize("acts_dir", act_set_testcase_provider())
-def test_amending_exact(acts_dir: Path, tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+# More than one worker process also tests the pickling of acts, and the worker side setup
+@pytest.mark.parametrize("worker_processes", (1, 2))
+def test_amending_exact(acts_dir: Path, worker_processes: int, tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
     Database.CACHE.clear()
     monkeypatch.setattr(AJDBConfig, "STORAGE_PATH", tmp_path)
+    monkeypatch.setattr(AJDBConfig, "WORKER_PROCESSES", worker_processes)
 
     for file_path in acts_dir.iterdir():
         if file_path.name not in ('expected.yaml', 'target_date.yaml'):
@@ -53,7 +84,10 @@ def test_amending_exact(acts_dir: Path, tmp_path: Path, monkeypatch: MonkeyPatch
     with (acts_dir / 'target_date.yaml').open('r') as f:
         target_date = dict2object.to_object(yaml.load(f, Loader=yaml.Loader), Date)
 
-    Database.recompute_date_range(Date(2009, 1, 1), target_date)
+    if worker_processes > 1:
+        recompute_in_subprocess(tmp_path, worker_processes, target_date)
+    else:
+        Database.recompute_date_range(Date(2009, 1, 1), target_date)
     act_set = Database.load_act_set(target_date)
 
     resulting_act = act_set.act(expected_act.identifier).to_simple_act()
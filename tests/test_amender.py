@@ -0,0 +1,180 @@
+# Copyright 2020, Alex Badics, All Rights Reserved
+from typing import Tuple, Type, Callable, Sequence, Any
+
+import pytest
+
+from hun_law.structure import Act, Article, Reference, Paragraph, AlphabeticPoint, \
+    EnforcementDate, DaysAfterPublication, Repeal, TextAmendment, ArticleTitleAmendment, SemanticData
+from hun_law.utils import Date
+
+from ajdb.structure import ActWM, ParagraphWM, SaeMetadata
+from ajdb.amender import ActConverter, ModificationApplier, RepealApplier, TextReplacementApplier, ArticleTitleAmendmentApplier
+
+from tests.utils import add_fake_semantic_data
+
+ACT_ID = "2345. évi XD. törvény"
+
+TEST_ACT = add_fake_semantic_data(Act(
+    identifier=ACT_ID,
+    publication_date=Date(2345, 6, 7),
+    subject="A hatályon kívül helyezésről",
+    preamble="",
+    children=(
+        Article(
+            identifier="1",
+            title="A próba címe",
+            children=(
+                Paragraph(
+                    identifier="1",
+                    text="Ez a törvény a kihirdetését követő napon lép hatályba.",
+                    semantic_data=(
+                        EnforcementDate(position=None, date=DaysAfterPublication()),
+                    )
+                ),
+                Paragraph(
+                    identifier="2",
+                    intro="Egy felsorolás",
+                    children=(
+                        AlphabeticPoint(
+                            identifier="a",
+                            text="első",
+                        ),
+                        AlphabeticPoint(
+                            identifier="b",
+                            text="második",
+                        ),
+                    )
+                ),
+            )
+        ),
+    )
+))
+
+SOURCE_SAE = ParagraphWM(
+    text="Hatályát veszti",
+    semantic_data=(),
+    outgoing_references=(),
+    act_id_abbreviations=(),
+    metadata=SaeMetadata()
+)
+
+ARTICLE_REF = Reference(ACT_ID, "1")
+PARAGRAPH_REF = Reference(ACT_ID, "1", "2")
+POINT_REF = Reference(ACT_ID, "1", "2", "b")
+
+
+CURRENT_DATE = Date(2346, 1, 1)
+
+# Applier class, the batched apply function, modifications, expected applied flags
+BATCHED_CASES = (
+    # The point is already gone when its own repeal would be applied
+    pytest.param(
+        RepealApplier, RepealApplier.apply_multiple_sae_repeals,
+        (Repeal(position=PARAGRAPH_REF), Repeal(position=POINT_REF)),
+        (True, False),
+        id="sae_repeals_parent_first",
+    ),
+    pytest.param(
+        RepealApplier, RepealApplier.apply_multiple_sae_repeals,
+        (Repeal(position=POINT_REF), Repeal(position=PARAGRAPH_REF)),
+        (True, True),
+        id="sae_repeals_child_first",
+    ),
+    pytest.param(
+        RepealApplier, RepealApplier.apply_multiple_sae_repeals,
+        (Repeal(position=POINT_REF), Repeal(position=POINT_REF)),
+        (True, True),
+        id="sae_repeals_same_sae",
+    ),
+    pytest.param(
+        TextReplacementApplier, TextReplacementApplier.apply_multiple,
+        (
+            TextAmendment(position=PARAGRAPH_REF, original_text="első", replacement_text="harmadik"),
+            TextAmendment(position=PARAGRAPH_REF, original_text="harmadik", replacement_text="negyedik"),
+        ),
+        (True, True),
+        id="text_replacements_chained",
+    ),
+    # The text to be replaced only appears after the second replacement
+    pytest.param(
+        TextReplacementApplier, TextReplacementApplier.apply_multiple,
+        (
+            TextAmendment(position=PARAGRAPH_REF, original_text="harmadik", replacement_text="negyedik"),
+            TextAmendment(position=PARAGRAPH_REF, original_text="első", replacement_text="harmadik"),
+        ),
+        (False, True),
+        id="text_replacements_chained_reverse_order",
+    ),
+    pytest.param(
+        TextReplacementApplier, TextReplacementApplier.apply_multiple,
+        (
+            TextAmendment(position=PARAGRAPH_REF, original_text="felsorolás", replacement_text="lista"),
+            TextAmendment(position=PARAGRAPH_REF, original_text="sorolás", replacement_text="számozás"),
+            TextAmendment(position=PARAGRAPH_REF, original_text="ásodik", replacement_text="ásik"),
+            TextAmendment(position=PARAGRAPH_REF, original_text="második", replacement_text="kettes"),
+        ),
+        (True, False, True, False),
+        id="text_replacements_overlapping",
+    ),
+    pytest.param(
+        TextReplacementApplier, TextReplacementApplier.apply_multiple,
+        (
+            TextAmendment(position=POINT_REF, original_text="első", replacement_text="harmadik"),
+            Repeal(position=POINT_REF, text="második"),
+            TextAmendment(position=PARAGRAPH_REF, original_text="Egy", replacement_text="Kettő"),
+        ),
+        (False, True, True),
+        id="text_replacements_positions",
+    ),
+    # Applied, even though the text stays the same
+    pytest.param(
+        TextReplacementApplier, TextReplacementApplier.apply_multiple,
+        (
+            TextAmendment(position=PARAGRAPH_REF, original_text="első", replacement_text="első"),
+        ),
+        (True, ),
+        id="text_replacements_same_text",
+    ),
+    pytest.param(
+        ArticleTitleAmendmentApplier, ArticleTitleAmendmentApplier.apply_multiple,
+        (
+            ArticleTitleAmendment(position=ARTICLE_REF, original_text="próba", replacement_text="teszt"),
+            ArticleTitleAmendment(position=ARTICLE_REF, original_text="teszt", replacement_text="vizsga"),
+        ),
+        (True, True),
+        id="title_amendments_chained",
+    ),
+    pytest.param(
+        ArticleTitleAmendmentApplier, ArticleTitleAmendmentApplier.apply_multiple,
+        (
+            ArticleTitleAmendment(position=ARTICLE_REF, original_text="próba", replacement_text="teszt"),
+            ArticleTitleAmendment(position=ARTICLE_REF, original_text="róba", replacement_text="óra"),
+            ArticleTitleAmendment(position=ARTICLE_REF, original_text="címe", replacement_text="neve"),
+        ),
+        (True, False, True),
+        id="title_amendments_overlapping",
+    ),
+)
+
+
+@pytest.mark.parametrize("applier_class,apply_multiple,modifications,expected_applied", BATCHED_CASES)
+def test_batched_application(
+    applier_class: Type[ModificationApplier],
+    apply_multiple: Callable[[Sequence[Any], ActWM], ActWM],
+    modifications: Tuple[SemanticData, ...],
+    expected_applied: Tuple[bool, ...],
+) -> None:
+    # The batched apply functions must give the same results as applying the modifications one by one
+    act: ActWM = ActConverter.convert_hun_law_act(TEST_ACT)
+
+    sequential_appliers = [applier_class(m, SOURCE_SAE, CURRENT_DATE) for m in modifications]
+    expected_act = act
+    for applier in sequential_appliers:
+        expected_act = applier.apply(expected_act)
+
+    batched_appliers = [applier_class(m, SOURCE_SAE, CURRENT_DATE) for m in modifications]
+    resulting_act = apply_multiple(batched_appliers, act)
+
+    assert resulting_act == expected_act
+    assert tuple(a.applied for a in sequential_appliers) == expected_applied
+    assert tuple(a.applied for a in batched_appliers) == expected_applied
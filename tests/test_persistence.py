@@ -14,6 +14,7 @@ from hun_law import dict2object
 from ajdb.config import AJDBConfig
 from ajdb.structure import ActWMProxy, ArticleWMProxy, ArticleWM, ParagraphWM, AlphabeticPointWM, SaeMetadata
 from ajdb.amender import ActConverter
+from ajdb.database import Database
 
 from tests.utils import add_fake_semantic_data
 
@@ -191,3 +192,24 @@ def test_persistence_object_storage(tmp_path: Path, monkeypatch: MonkeyPatch) ->
     assert len(act_objects) == 3, "Changing an Act creates new blob"
     article_objects = tuple((tmp_path / 'articles').rglob('*.json.gz'))
     assert len(article_objects) == 7, "Changing an Article only adds that article's blob"
+
+
+def test_hun_law_act_cache(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(AJDBConfig, "STORAGE_PATH", tmp_path)
+    act_path = Database.store_hun_law_act(TEST_ACT)
+
+    assert ActConverter.load_hun_law_act_cached(act_path) == TEST_ACT
+    cache_files = tuple((tmp_path / 'hun_law_act_cache').rglob('*.pickle'))
+    assert len(cache_files) == 1
+
+    changed_act = attr.evolve(TEST_ACT, subject="A tesztelésről, megváltoztatva")
+    assert Database.store_hun_law_act(changed_act) == act_path
+    assert ActConverter.load_hun_law_act_cached(act_path) == changed_act, "Changing the source file invalidates the cache"
+    cache_files = tuple((tmp_path / 'hun_law_act_cache').rglob('*.pickle'))
+    assert len(cache_files) == 1, "Stale cache entries are overwritten"
+
+    def failing_loader(_path: Path) -> Act:
+        raise AssertionError("The cache was not used")
+
+    monkeypatch.setattr(ActConverter, "load_hun_law_act", failing_loader)
+    assert ActConverter.load_hun_law_act_cached(act_path) == changed_act
@@ -1,6 +1,6 @@
 # Copyright 2020, Alex Badics, All Rights Reserved
 
-from ajdb.utils import LruDict
+from ajdb.utils import LruDict, TwoRandomChoiceDict
 
 
 def test_lru_dict() -> None:
@@ -29,3 +29,36 @@ def test_lru_dict() -> None:
     assert lru_dict.get(23) is None
     assert lru_dict.get(11) == 'x'
     assert ''.join(lru_dict.values()) == 'fCEx'
+
+
+def test_two_random_choice_dict() -> None:
+    cache: TwoRandomChoiceDict[int, str] = TwoRandomChoiceDict(3)
+    cache[1] = 'a'
+    cache[2] = 'b'
+    cache[3] = 'c'
+    assert len(cache) == 3
+    assert cache[2] == 'b'
+    cache[2] = 'B'
+    assert cache[2] == 'B'
+    assert len(cache) == 3
+
+    # Keep 3 the most recently used, so it can never lose the two-way comparison
+    for i in range(4, 100):
+        assert cache[3] == 'c'
+        cache[i] = str(i)
+        assert len(cache) == 3
+        assert i in cache
+        assert 3 in cache
+    assert cache.get(1) is None
+    assert cache.get(99) == '99'
+
+    del cache[3]
+    assert 3 not in cache
+    assert len(cache) == 2
+    assert 99 in cache.keys()
+    cache[100] = '100'
+    assert len(cache) == 3
+
+    cache.clear()
+    assert len(cache) == 0
+    assert 99 not in cache